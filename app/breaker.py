@@ -0,0 +1,178 @@
+import os
+import time
+import logging
+
+import redis
+from dotenv import load_dotenv
+
+from .redis import queue
+from .retry import PermanentError
+from .metrics import RETRY_BUDGET_EXHAUSTED
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def load_breaker_config():
+    """Pull retry-budget and circuit-breaker knobs from environment (.env)."""
+    return {
+        "budget_ratio": float(os.getenv("RETRY_BUDGET_RATIO", 0.2)),
+        "budget_min": int(os.getenv("RETRY_BUDGET_MIN", 10)),
+        "budget_window": int(os.getenv("RETRY_BUDGET_WINDOW", 10)),
+        "threshold": int(os.getenv("BREAKER_THRESHOLD", 5)),
+        "window": int(os.getenv("BREAKER_WINDOW", 30)),
+        "cooldown": int(os.getenv("BREAKER_COOLDOWN", 30)),
+        "mode": os.getenv("BREAKER_MODE", "park"),  # "park" or "fail"
+    }
+
+
+class CircuitOpenError(PermanentError):
+    """Raised instead of calling a handler while its breaker is open."""
+
+
+class RetryBudget:
+    """Shared cap on retries for one job type, as a ratio of recent successes.
+
+    Counters live in a Redis hash per fixed time window, so every worker
+    draws from the same budget. A retry is allowed while
+    `retries <= min_retries + ratio * successes` for the current window.
+    """
+
+    def __init__(self, job_type, *, ratio, min_retries, window, connection=None):
+        self.job_type = job_type
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        # Each job type's counters live on the shard its name hashes to
+        self.conn = connection or queue.connection_for(job_type)
+
+    def _key(self):
+        return f"retry_budget:{self.job_type}:{int(time.time() // self.window)}"
+
+    def record_success(self):
+        key = self._key()
+        try:
+            pipe = self.conn.pipeline()
+            pipe.hincrby(key, "ok", 1)
+            pipe.expire(key, self.window * 2)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Retry budget unavailable: {e}")
+
+    def can_retry(self) -> bool:
+        key = self._key()
+        try:
+            pipe = self.conn.pipeline()
+            pipe.hincrby(key, "retry", 1)
+            pipe.hget(key, "ok")
+            pipe.expire(key, self.window * 2)
+            retries, ok, _ = pipe.execute()
+            if retries <= self.min_retries + self.ratio * int(ok or 0):
+                return True
+            self.conn.hincrby(key, "retry", -1)
+            RETRY_BUDGET_EXHAUSTED.labels(type=self.job_type).inc()
+            logger.warning(f"Retry budget exhausted for job type {self.job_type}")
+            return False
+        except redis.RedisError as e:
+            logger.warning(f"Retry budget unavailable: {e}")
+            return True  # fail-open if Redis transiently unavailable
+
+
+class CircuitBreaker:
+    """Redis-backed breaker shared by all workers for one job type.
+
+    CLOSED: jobs that end in a retryable failure are counted in a
+    `window`-second bucket (successes do not reset it; the bucket simply
+    expires); at `threshold` the breaker opens for `cooldown` seconds. After
+    the cooldown it is HALF-OPEN: a single probe job is admitted (others are
+    rejected until it finishes or its `cooldown`-long claim expires); its
+    failure reopens the breaker, its success closes it.
+    """
+
+    def __init__(self, job_type, *, threshold, window, cooldown, connection=None):
+        self.job_type = job_type
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.conn = connection or queue.connection_for(job_type)
+        self._failures = f"breaker:{job_type}:failures"
+        self._open = f"breaker:{job_type}:open"
+        self._tripped = f"breaker:{job_type}:tripped"
+        self._probe = f"breaker:{job_type}:probe"
+
+    def allow(self) -> bool:
+        try:
+            pipe = self.conn.pipeline()
+            pipe.exists(self._open)
+            pipe.exists(self._tripped)
+            is_open, half_open = pipe.execute()
+            if is_open:
+                return False
+            if half_open:
+                # Only the worker that claims the probe slot gets through
+                return bool(self.conn.set(self._probe, 1, nx=True, ex=self.cooldown))
+            return True
+        except redis.RedisError as e:
+            logger.warning(f"Circuit breaker unavailable: {e}")
+            return True
+
+    def record_success(self):
+        try:
+            # Only a half-open success resets the count; while CLOSED,
+            # failures age out with the window TTL. A job that started before
+            # the trip and finishes while OPEN must not close the breaker.
+            if self.conn.exists(self._open):
+                return
+            if self.conn.delete(self._tripped):
+                self.conn.delete(self._failures, self._probe)
+        except redis.RedisError as e:
+            logger.warning(f"Circuit breaker unavailable: {e}")
+
+    def record_failure(self):
+        try:
+            pipe = self.conn.pipeline()
+            pipe.incr(self._failures)
+            pipe.expire(self._failures, self.window, nx=True)
+            pipe.exists(self._tripped)
+            failures, _, half_open = pipe.execute()
+            if half_open or failures >= self.threshold:
+                self.trip()
+        except redis.RedisError as e:
+            logger.warning(f"Circuit breaker unavailable: {e}")
+
+    def trip(self):
+        pipe = self.conn.pipeline()
+        pipe.set(self._open, 1, ex=self.cooldown)
+        pipe.set(self._tripped, 1, ex=self.cooldown + self.window)
+        pipe.delete(self._failures, self._probe)
+        pipe.execute()
+        logger.warning(f"Circuit breaker OPEN for job type {self.job_type}")
+
+
+# ---------------- Per job-type registry ----------------
+_cfg = load_breaker_config()
+_budgets = {}
+_breakers = {}
+
+
+def get_budget(job_type: str) -> RetryBudget:
+    if job_type not in _budgets:
+        _budgets[job_type] = RetryBudget(
+            job_type,
+            ratio=_cfg["budget_ratio"],
+            min_retries=_cfg["budget_min"],
+            window=_cfg["budget_window"],
+        )
+    return _budgets[job_type]
+
+
+def get_breaker(job_type: str) -> CircuitBreaker:
+    if job_type not in _breakers:
+        _breakers[job_type] = CircuitBreaker(
+            job_type,
+            threshold=_cfg["threshold"],
+            window=_cfg["window"],
+            cooldown=_cfg["cooldown"],
+        )
+    return _breakers[job_type]
@@ -1,6 +1,6 @@
 import os
 from contextlib import contextmanager
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./jobs.db")
@@ -20,6 +20,32 @@ def init_db() -> None:
     # IMPORTANT: ensure models are imported so their tables are registered
     from . import models  # noqa: F401
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+def upgrade_schema(bind) -> None:
+    """Add columns and indexes that existing tables are missing.
+
+    `create_all` only creates missing tables, so a database created by an
+    older release never gets new columns or indexes. Only additive, nullable
+    changes are applied; anything else must be migrated by hand.
+    """
+    insp = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            columns = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in columns:
+                    continue
+                if not col.nullable:
+                    raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{col.name}; migrate manually")
+                col_type = col.type.compile(dialect=bind.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}"))
+            indexes = {i["name"] for i in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
 
 @contextmanager
 def get_session():
@@ -0,0 +1,305 @@
+import os
+import json
+import socket
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+import orjson
+import redis
+from dotenv import load_dotenv
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .models import Job, JobArchive, JobFields, JobGroup, JobStatus, TERMINAL_STATUSES
+from .redis import queue
+from .metrics import GROUPS_COMPLETED
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+hostname = socket.gethostname()
+
+# How long group counters stay in Redis after the last update; afterwards reads hit the DB
+GROUP_TTL = int(os.getenv("GROUP_TTL", 86400))
+# RUNNING groups older than this are re-checked against the DB by the sweep
+GROUP_SWEEP_AFTER = int(os.getenv("GROUP_SWEEP_AFTER", 300))
+MAX_GROUP_SIZE = int(os.getenv("MAX_GROUP_SIZE", "10000"))
+
+
+# ---------------- Reducers ----------------
+def _child_result(child: JobFields) -> Optional[dict]:
+    if child.status != JobStatus.SUCCEEDED.value or not child.result_json:
+        return None
+    return json.loads(child.result_json)
+
+
+def reduce_collect(children):
+    """Child results in submission order (None for children that did not succeed)."""
+    return {"results": [_child_result(c) for c in children]}
+
+
+def reduce_combined_digest(children):
+    """sha256 over the digests of all succeeded hash children, in submission order."""
+    h = hashlib.sha256()
+    count = 0
+    for c in children:
+        result = _child_result(c)
+        if result is not None:
+            h.update(result["digest"].encode("utf-8"))
+            count += 1
+    return {"algo": "sha256", "digest": h.hexdigest(), "count": count}
+
+
+REDUCERS = {
+    "collect": reduce_collect,
+    "combined_digest": reduce_combined_digest,
+}
+
+# Job types a reducer can handle; reducers not listed here accept any type
+REDUCER_JOB_TYPES = {
+    "combined_digest": {"hash"},
+}
+
+
+# ---------------- Redis progress counters ----------------
+def _key(group_id: str) -> str:
+    return f"group:{group_id}"
+
+
+def _members_key(group_id: str) -> str:
+    return f"group:{group_id}:members"
+
+
+def _conn(group_id: str):
+    # Group state lives on the same shard its id hashes to
+    return queue.connection_for(group_id)
+
+
+def start_group(group: JobGroup) -> None:
+    """Seed the group's counters; must run before any child is enqueued."""
+    mapping = {
+        "type": group.job_type,
+        "reducer": group.reducer or "",
+        "status": JobStatus.RUNNING.value,
+        "total": group.total,
+        "done": 0,
+    }
+    mapping.update({s: 0 for s in TERMINAL_STATUSES})
+    pipe = _conn(group.id).pipeline()
+    pipe.hset(_key(group.id), mapping=mapping)
+    pipe.expire(_key(group.id), GROUP_TTL)
+    pipe.execute()
+
+
+def fail_group(db: Session, group: JobGroup, error: str) -> None:
+    """Mark a group whose children could not all be enqueued as FAILED."""
+    now = datetime.utcnow()
+    group.status = JobStatus.FAILED.value
+    group.last_error = error
+    group.completed_at = now
+    db.query(Job).filter(
+        Job.group_id == group.id, Job.status == JobStatus.QUEUED.value
+    ).update({"status": JobStatus.FAILED.value, "last_error": error, "completed_at": now})
+    db.commit()
+    try:
+        _conn(group.id).delete(_key(group.id))  # reads fall back to the DB row
+    except redis.RedisError as e:
+        logger.error(f"[{hostname}] Could not clear counters of group {group.id}: {e}")
+
+
+def record_child_done(group_id: str, job_id: str, status: str) -> None:
+    """Count one terminal child; the last one to finish enqueues finalize_group.
+
+    Does nothing once the counters are gone (expired, or cleared by
+    fail_group), so a late child cannot recreate a partial hash. Redis errors
+    are logged and dropped; sweep_stale_groups finalizes any group whose
+    counters fell behind.
+    """
+    key, members = _key(group_id), _members_key(group_id)
+    try:
+        with _conn(group_id).pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key, members)
+                    # SISMEMBER makes a redelivered child count only once
+                    if not pipe.exists(key) or pipe.sismember(members, job_id):
+                        return
+                    pipe.multi()
+                    pipe.sadd(members, job_id)
+                    pipe.hincrby(key, "done", 1)
+                    pipe.hincrby(key, status, 1)
+                    pipe.hget(key, "total")
+                    pipe.expire(key, GROUP_TTL)
+                    pipe.expire(members, GROUP_TTL)
+                    _, done, _, total, _, _ = pipe.execute()
+                    break
+                except redis.WatchError:
+                    continue  # another child finished concurrently; re-check
+        if total is not None and done == int(total):
+            queue.enqueue(group_id, finalize_group, group_id)
+    except redis.RedisError as e:
+        logger.error(f"[{hostname}] Could not record child {job_id} of group {group_id}: {e}")
+
+
+# ---------------- Fan-in ----------------
+def _children(db: Session, group_id: str) -> list:
+    """Child jobs in submission order, including children already archived."""
+    rows = []
+    for model in (Job, JobArchive):
+        rows += db.query(model).filter(model.group_id == group_id).all()
+    return sorted(rows, key=lambda c: c.group_index)
+
+
+def _terminal_counts(db: Session, group_id: str) -> dict:
+    """Terminal children per status, hot and archived."""
+    counts = {s: 0 for s in TERMINAL_STATUSES}
+    for model in (Job, JobArchive):
+        rows = (
+            db.query(model.status, func.count())
+            .filter(model.group_id == group_id, model.status.in_(TERMINAL_STATUSES))
+            .group_by(model.status)
+            .all()
+        )
+        for status, n in rows:
+            counts[status] += n
+    return counts
+
+
+def finalize_group(group_id: str) -> None:
+    """Run the group's reducer over its children and publish the final status."""
+    db = SessionLocal()
+    try:
+        group = db.get(JobGroup, group_id, with_for_update=True)
+        if not group:
+            logger.warning(f"[{hostname}] Group {group_id} not found")
+            return
+        if group.status != JobStatus.RUNNING.value:
+            return  # already finalized (e.g. by the sweep)
+
+        children = _children(db, group_id)
+        counts = {s: 0 for s in TERMINAL_STATUSES}
+        for c in children:
+            if c.status in counts:
+                counts[c.status] += 1
+        group.succeeded = counts[JobStatus.SUCCEEDED.value]
+        group.failed = counts[JobStatus.FAILED.value]
+        group.compensated = counts[JobStatus.COMPENSATED.value]
+
+        try:
+            if group.reducer:
+                group.result_json = json.dumps(REDUCERS[group.reducer](children))
+            group.status = JobStatus.SUCCEEDED.value
+        except Exception as e:
+            group.status = JobStatus.FAILED.value
+            group.last_error = str(e)
+            logger.error(f"[{hostname}] Group {group_id} reducer FAILED: {e}")
+
+        group.completed_at = datetime.utcnow()
+        db.commit()
+
+        GROUPS_COMPLETED.labels(status=group.status).inc()
+        logger.info(f"[{hostname}] Group {group_id} {group.status}")
+
+        conn = _conn(group_id)
+        pipe = conn.pipeline()
+        pipe.hset(_key(group_id), mapping={
+            # counts from the DB are authoritative, even if Redis missed updates
+            **counts,
+            "type": group.job_type,
+            "reducer": group.reducer or "",
+            "total": group.total,
+            "done": sum(counts.values()),
+            "status": group.status,
+            "result": group.result_json or "",
+            "lastError": group.last_error or "",
+            "completedAt": group.completed_at.isoformat(),
+        })
+        pipe.expire(_key(group_id), GROUP_TTL)
+        pipe.expire(_members_key(group_id), GROUP_TTL)
+        pipe.execute()
+    finally:
+        db.close()
+
+
+def sweep_stale_groups(db: Session, *, older_than: int = GROUP_SWEEP_AFTER,
+                       limit: int = 100, now: Optional[datetime] = None) -> int:
+    """Finalize RUNNING groups whose children are all terminal in the DB.
+
+    Recovers groups whose Redis counters missed an update (shard blip, lost
+    finalize enqueue). Returns the number of groups finalized.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=older_than)
+    stale = (
+        db.query(JobGroup.id, JobGroup.total)
+        .filter(JobGroup.status == JobStatus.RUNNING.value, JobGroup.created_at < cutoff)
+        .order_by(JobGroup.created_at)
+        .limit(limit)
+        .all()
+    )
+    finalized = 0
+    for group_id, total in stale:
+        done = sum(_terminal_counts(db, group_id).values())
+        if done >= total:
+            logger.warning(f"[{hostname}] Group {group_id} counters stale; finalizing from DB")
+            finalize_group(group_id)
+            finalized += 1
+    return finalized
+
+
+# ---------------- Status lookup ----------------
+def group_job_ids(db: Session, group_id: str) -> list:
+    """Child job ids in submission order, including children already archived."""
+    rows = []
+    for model in (Job, JobArchive):
+        rows += db.query(model.group_index, model.id).filter(model.group_id == group_id).all()
+    return [job_id for _, job_id in sorted(rows)]
+
+
+# A hash missing any of these (e.g. recreated by a stray write) is treated as a miss
+_HASH_FIELDS = frozenset(("type", "reducer", "status", "total", "done", *TERMINAL_STATUSES))
+
+
+def get_group_status(db: Session, group_id: str) -> Optional[dict]:
+    """Group status from its Redis hash (one HGETALL), falling back to the DB."""
+    try:
+        raw = _conn(group_id).hgetall(_key(group_id))
+    except redis.RedisError:
+        raw = None
+    h = {k.decode(): v.decode() for k, v in (raw or {}).items()}
+    if _HASH_FIELDS <= h.keys():
+        resp = {
+            "id": group_id,
+            "type": h["type"],
+            "reducer": h["reducer"] or None,
+            "status": h["status"],
+            "total": int(h["total"]),
+            "done": int(h["done"]),
+            "succeeded": int(h[JobStatus.SUCCEEDED.value]),
+            "failed": int(h[JobStatus.FAILED.value]),
+            "compensated": int(h[JobStatus.COMPENSATED.value]),
+            "lastError": h.get("lastError") or None,
+            "completedAt": h.get("completedAt") or None,
+        }
+        if h.get("result"):
+            resp["result"] = orjson.Fragment(h["result"])
+        return resp
+
+    group = db.get(JobGroup, group_id)
+    if not group:
+        return None
+    resp = group.to_dict()
+    if group.status == JobStatus.RUNNING.value:
+        # Counters unavailable: count children directly (slow path)
+        counts = _terminal_counts(db, group_id)
+        resp["succeeded"] = counts[JobStatus.SUCCEEDED.value]
+        resp["failed"] = counts[JobStatus.FAILED.value]
+        resp["compensated"] = counts[JobStatus.COMPENSATED.value]
+        resp["done"] = sum(counts.values())
+    if group.result_json:
+        resp["result"] = orjson.Fragment(group.result_json)
+    return resp
@@ -1,25 +1,32 @@
 import os
 import uuid
-import json
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Depends, status
+import orjson
+import redis
+from fastapi import FastAPI, HTTPException, Depends, Request, status
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from prometheus_fastapi_instrumentator import Instrumentator
-from .db import SessionLocal, Base, engine
-from .models import Job, JobStatus
+from .db import SessionLocal, init_db
+from .models import Job, JobGroup, JobStatus
 from . import tasks
-from .redis import queue
+from .retention import get_job_any, find_archived_by_idempotency_key
+from .redis import queue, shard_key
+from .groups import REDUCERS, REDUCER_JOB_TYPES, MAX_GROUP_SIZE, start_group, fail_group, group_job_ids, get_group_status
 from .metrics import REQUEST_COUNT
+from .schemas import JobRequest, GroupRequest, describe_payload_error
 
 
 MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "1000"))
 
-app = FastAPI(title="Async Task Service", version="1.0")
+app = FastAPI(title="Async Task Service", version="1.0", default_response_class=ORJSONResponse)
 Instrumentator().instrument(app).expose(app)
 
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
+    init_db()  # create missing tables, then add missing columns/indexes
 
 
 def get_db():
@@ -30,37 +37,39 @@ def get_db():
         db.close()
 
 
+async def get_body(request: Request) -> bytes:
+    return await request.body()
+
+
 # --- Healthcheck ---
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
-# --- POST /v1/jobs ---
-@app.post("/v1/jobs")
-def create_job(job: dict, db: Session = Depends(get_db)):
-    # Custom counter for submission endpoint
-    REQUEST_COUNT.inc()
-
-    job_type = job.get("type")
-    payload = job.get("payload") or {}
-    idempotency_key = job.get("idempotencyKey")
-
+def _check_job_type(job_type):
     if not job_type:
         raise HTTPException(status_code=400, detail="Missing job type")
 
-    if job_type not in ("hash", "block_ip"):
+    if job_type not in tasks.JOB_TYPES:
         raise HTTPException(status_code=400, detail=f"Unsupported job type: {job_type}")
 
-    if job_type == "block_ip" and not payload.get("ip"):
-        raise HTTPException(status_code=400, detail="block_ip requires 'ip' in payload")
 
-    # Backpressure: bounded queue → 429 when full
+def _validate_payload(job_type: str, payload, prefix: str = "") -> dict:
+    """Validate a payload against the job type's registered model."""
+    try:
+        payload_model = tasks.JOB_TYPES[job_type]["payload"].model_validate(payload or {})
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=prefix + describe_payload_error(job_type, e))
+    return payload_model.model_dump(exclude_unset=True)
+
+
+def _check_backpressure(incoming: int):
     try:
-        q_len = len(queue)  # RQ Queue implements __len__ -> count
+        q_len = len(queue)  # summed across all Redis shards
     except Exception:
         q_len = 0  # fail-open if Redis transiently unavailable
-    if q_len >= MAX_QUEUE_SIZE:
+    if q_len + incoming > MAX_QUEUE_SIZE:
         # Optionally advise a retry-after; client can respect it
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
@@ -68,9 +77,42 @@ def create_job(job: dict, db: Session = Depends(get_db)):
             headers={"Retry-After": "3"},
         )
 
+
+# --- POST /v1/jobs ---
+@app.post(
+    "/v1/jobs",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": JobRequest.model_json_schema()}},
+        }
+    },
+)
+def create_job(body: bytes = Depends(get_body), db: Session = Depends(get_db)):
+    # Custom counter for submission endpoint
+    REQUEST_COUNT.inc()
+
+    # Parse + validate the raw body in one pass (no intermediate dict)
+    try:
+        job = JobRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid request body: {e.errors()[0]['msg']}")
+
+    job_type = job.type
+    idempotency_key = job.idempotencyKey
+
+    _check_job_type(job_type)
+    payload = _validate_payload(job_type, job.payload)
+
+    # Backpressure: bounded queue → 429 when full
+    _check_backpressure(1)
+
     # Idempotency check
     if idempotency_key:
-        existing = db.query(Job).filter(Job.idempotency_key == idempotency_key).first()
+        existing = (
+            db.query(Job).filter(Job.idempotency_key == idempotency_key).first()
+            or find_archived_by_idempotency_key(db, idempotency_key)
+        )
         if existing:
             return {"jobId": existing.id}
 
@@ -79,7 +121,7 @@ def create_job(job: dict, db: Session = Depends(get_db)):
     db_job = Job(
         id=job_id,
         job_type=job_type,
-        payload=json.dumps(payload) if payload else None,
+        payload=orjson.dumps(payload).decode() if payload else None,
         idempotency_key=idempotency_key,
         status=JobStatus.QUEUED.value,
         created_at=datetime.utcnow(),
@@ -87,40 +129,135 @@ def create_job(job: dict, db: Session = Depends(get_db)):
     db.add(db_job)
     db.commit()
 
-    # Enqueue into worker
-    # (Using the plain RQ queue; worker pool size is controlled by how many workers you run)
-    queue.enqueue(tasks.process_job, job_id, job_type, payload)
+    # Enqueue onto the job's Redis shard
+    # (worker pool size is controlled by how many workers you run per shard)
+    tasks.enqueue_job(job_id, job_type, payload)
 
     return {"jobId": job_id}
 
 
+def _job_response(job) -> dict:
+    """Job dict for responses; `result_json` is embedded as-is, never re-parsed."""
+    resp = job.to_dict()
+    # result_json is only ever written by the worker via json.dumps, so it is
+    # trusted to be valid JSON and spliced into the response untouched
+    if job.result_json:
+        resp["result"] = orjson.Fragment(job.result_json)
+    return resp
+
+
 # --- GET /v1/jobs/{jobId} ---
 @app.get("/v1/jobs/{job_id}")
 def get_job(job_id: str, db: Session = Depends(get_db)):
-    job = db.query(Job).get(job_id)
+    job = get_job_any(db, job_id)  # falls back to jobs_archive
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    resp = job.to_dict()
-    # Include "result" if present
-    if getattr(job, "result_json", None) and "result" not in resp:
-        try:
-            resp["result"] = json.loads(job.result_json)
-        except Exception:
-            resp["result"] = {}
-    return resp
+    return ORJSONResponse(_job_response(job))
 
 
 # --- GET /v1/jobs (list recent first) ---
 @app.get("/v1/jobs")
 def list_jobs(db: Session = Depends(get_db)):
     jobs = db.query(Job).order_by(Job.created_at.desc()).all()
-    out = []
-    for j in jobs:
-        d = j.to_dict()
-        if getattr(j, "result_json", None) and "result" not in d:
-            try:
-                d["result"] = json.loads(j.result_json)
-            except Exception:
-                d["result"] = {}
-        out.append(d)
-    return out
\ No newline at end of file
+    return ORJSONResponse([_job_response(j) for j in jobs])
+
+
+# --- POST /v1/groups ---
+@app.post(
+    "/v1/groups",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": GroupRequest.model_json_schema()}},
+        }
+    },
+)
+def create_group(body: bytes = Depends(get_body), db: Session = Depends(get_db)):
+    try:
+        group = GroupRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid request body: {e.errors()[0]['msg']}")
+
+    job_type = group.type
+    _check_job_type(job_type)
+
+    max_size = min(MAX_GROUP_SIZE, MAX_QUEUE_SIZE)
+    if len(group.payloads) > max_size:
+        raise HTTPException(status_code=400, detail=f"Group too large (max {max_size} payloads)")
+
+    if group.reducer and group.reducer not in REDUCERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported reducer: {group.reducer}")
+    if job_type not in REDUCER_JOB_TYPES.get(group.reducer, {job_type}):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Reducer {group.reducer} does not support job type {job_type}",
+        )
+
+    payloads = [
+        _validate_payload(job_type, p, prefix=f"payloads[{i}]: ")
+        for i, p in enumerate(group.payloads)
+    ]
+
+    _check_backpressure(len(payloads))
+
+    # Idempotency check
+    if group.idempotencyKey:
+        existing = db.query(JobGroup).filter(JobGroup.idempotency_key == group.idempotencyKey).first()
+        if existing:
+            return {"groupId": existing.id, "jobIds": group_job_ids(db, existing.id)}
+
+    # Create the group row and all child rows in one transaction
+    now = datetime.utcnow()
+    group_id = str(uuid.uuid4())
+    db_group = JobGroup(
+        id=group_id,
+        job_type=job_type,
+        reducer=group.reducer,
+        idempotency_key=group.idempotencyKey,
+        status=JobStatus.RUNNING.value,
+        total=len(payloads),
+        created_at=now,
+    )
+    child_ids = [str(uuid.uuid4()) for _ in payloads]
+    db.add(db_group)
+    db.execute(insert(Job), [
+        {
+            "id": child_id,
+            "job_type": job_type,
+            "payload": orjson.dumps(payload).decode() if payload else None,
+            "status": JobStatus.QUEUED.value,
+            "created_at": now,
+            "group_id": group_id,
+            "group_index": i,
+        }
+        for i, (child_id, payload) in enumerate(zip(child_ids, payloads))
+    ])
+
+    # Counters must exist before the first child can finish; seeding them
+    # before the commit means a Redis outage leaves no half-created group
+    try:
+        start_group(db_group)
+    except redis.RedisError as e:
+        db.rollback()
+        raise HTTPException(status_code=503, detail=f"Could not start group: {e}")
+    db.commit()
+
+    try:
+        queue.enqueue_many([
+            (shard_key(child_id, job_type), tasks.process_job, (child_id, job_type, payload))
+            for child_id, payload in zip(child_ids, payloads)
+        ])
+    except redis.RedisError as e:
+        fail_group(db, db_group, f"enqueue failed: {e}")
+        raise HTTPException(status_code=503, detail=f"Could not enqueue group: {e}")
+
+    return {"groupId": group_id, "jobIds": child_ids}
+
+
+# --- GET /v1/groups/{groupId} ---
+@app.get("/v1/groups/{group_id}")
+def get_group(group_id: str, db: Session = Depends(get_db)):
+    resp = get_group_status(db, group_id)  # Redis counters, DB fallback
+    if resp is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return ORJSONResponse(resp)
@@ -14,6 +14,33 @@ JOBS_PROCESSED = Counter(
     ["status"]
 )
 
+# Count terminal jobs moved from the hot table into jobs_archive
+JOBS_ARCHIVED = Counter(
+    "jobs_archived_total",
+    "Total jobs moved to the archive by the compactor"
+)
+
+# Retries refused because the job type's shared retry budget ran out
+RETRY_BUDGET_EXHAUSTED = Counter(
+    "retry_budget_exhausted_total",
+    "Retries skipped because the shared retry budget was exhausted, by job type",
+    ["type"]
+)
+
+# Job runs short-circuited by an open circuit breaker (failed fast or parked)
+BREAKER_REJECTED = Counter(
+    "circuit_breaker_rejected_total",
+    "Job runs rejected by an open circuit breaker, by job type",
+    ["type"]
+)
+
+# Count job groups finalized (reducer run), by group status
+GROUPS_COMPLETED = Counter(
+    "groups_completed_total",
+    "Total job groups finalized, by status",
+    ["status"]
+)
+
 # --- Pre-initialize counters so they appear as 0 in Prometheus ---
 for status in [JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.COMPENSATED]:
     JOBS_PROCESSED.labels(status=status.value).inc(0)
\ No newline at end of file
@@ -3,7 +3,7 @@ import json
 from datetime import datetime
 from enum import Enum
 from typing import Optional
-from sqlalchemy import Column, String, Integer, DateTime, Text
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index
 from .db import Base
 
 
@@ -15,8 +15,15 @@ class JobStatus(str, Enum):
     COMPENSATED = "COMPENSATED"
 
 
-class Job(Base):
-    __tablename__ = "jobs"
+TERMINAL_STATUSES = (
+    JobStatus.SUCCEEDED.value,
+    JobStatus.FAILED.value,
+    JobStatus.COMPENSATED.value,
+)
+
+
+class JobFields:
+    """Columns and helpers shared by the hot `jobs` table and its archive."""
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     job_type = Column(String(64), nullable=False)
@@ -30,6 +37,8 @@ class Job(Base):
     last_error = Column(Text, nullable=True)
     compensation_error = Column(Text, nullable=True)
     result_json = Column(Text, nullable=True)
+    group_id = Column(String(36), nullable=True, index=True)   # set for children of a JobGroup
+    group_index = Column(Integer, nullable=True)               # position within the group
 
     def to_dict(self):
         return {
@@ -43,4 +52,67 @@ class Job(Base):
         }
 
     def get_payload(self) -> Optional[dict]:
-        return json.loads(self.payload) if self.payload else None
\ No newline at end of file
+        return json.loads(self.payload) if self.payload else None
+
+
+class Job(JobFields, Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Lets the compactor find old terminal rows without scanning the table
+        Index("ix_jobs_completed_at", "completed_at"),
+    )
+
+
+class JobArchive(JobFields, Base):
+    """Terminal jobs moved out of `jobs` by the compactor (see app/retention.py).
+
+    On Postgres the table is range-partitioned by month of `completed_at`, so
+    the partition key has to be part of the primary key. SQLite ignores the
+    partitioning clause and gets a plain table with the same shape.
+    """
+    __tablename__ = "jobs_archive"
+    __table_args__ = (
+        Index("ix_jobs_archive_id", "id"),
+        {"postgresql_partition_by": "RANGE (completed_at)"},
+    )
+
+    completed_at = Column(DateTime, primary_key=True)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class JobGroup(Base):
+    """A fan-out of child jobs with an optional reducer run once all are terminal.
+
+    Live progress is tracked in Redis (see app/groups.py); the counters are
+    copied here when the group finishes.
+    """
+    __tablename__ = "job_groups"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_type = Column(String(64), nullable=False)
+    reducer = Column(String(64), nullable=True)
+    idempotency_key = Column(String(128), nullable=True, index=True)
+    status = Column(String(32), nullable=False, default=JobStatus.RUNNING.value)
+    total = Column(Integer, nullable=False)
+    succeeded = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    compensated = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    result_json = Column(Text, nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "type": self.job_type,
+            "reducer": self.reducer,
+            "status": self.status,
+            "total": self.total,
+            "done": self.succeeded + self.failed + self.compensated,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "compensated": self.compensated,
+            "lastError": self.last_error,
+            "completedAt": self.completed_at.isoformat() if self.completed_at else None,
+        }
@@ -1,11 +1,21 @@
 import os
 import redis
-from rq import Queue
 from dotenv import load_dotenv
+from .sharding import ShardedQueue
 
 load_dotenv()
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+# Comma-separated list of Redis nodes to shard the queue across
+REDIS_URLS = [u.strip() for u in os.getenv("REDIS_URLS", REDIS_URL).split(",") if u.strip()]
+# What a job is routed by: "job_id" spreads load, "type" keeps a job type on one node
+SHARD_KEY = os.getenv("SHARD_KEY", "job_id")
 
-_redis = redis.Redis.from_url(REDIS_URL)
-queue = Queue("tasksvc", connection=_redis)
\ No newline at end of file
+_shards = [redis.Redis.from_url(url) for url in REDIS_URLS]
+# Shared control state (retry budgets, circuit breakers) lives on the first node
+_redis = _shards[0]
+queue = ShardedQueue("tasksvc", _shards, REDIS_URLS)
+
+
+def shard_key(job_id: str, job_type: str) -> str:
+    return job_type if SHARD_KEY == "type" else job_id
@@ -0,0 +1,183 @@
+import os
+import time
+import socket
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select, insert, delete, text
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, init_db
+from .models import Job, JobArchive, JobFields, TERMINAL_STATUSES
+from .metrics import JOBS_ARCHIVED
+from .groups import sweep_stale_groups
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+hostname = socket.gethostname()
+
+# Columns copied verbatim from `jobs` into `jobs_archive`
+_COPY_COLUMNS = [c.name for c in Job.__table__.columns]
+
+
+def load_retention_config():
+    """Pull retention knobs from environment (.env)."""
+    return {
+        "hot_days": int(os.getenv("JOB_RETENTION_DAYS", 7)),
+        "archive_days": int(os.getenv("ARCHIVE_RETENTION_DAYS", 0)),  # 0 = keep forever
+        "batch_size": int(os.getenv("COMPACTOR_BATCH_SIZE", 500)),
+        "interval": float(os.getenv("COMPACTOR_INTERVAL", 300)),
+    }
+
+
+# ---------------- Archive lookups ----------------
+def find_archived_job(db: Session, job_id: str) -> Optional[JobArchive]:
+    return db.query(JobArchive).filter(JobArchive.id == job_id).first()
+
+
+def find_archived_by_idempotency_key(db: Session, key: str) -> Optional[JobArchive]:
+    return db.query(JobArchive).filter(JobArchive.idempotency_key == key).first()
+
+
+def get_job_any(db: Session, job_id: str) -> Optional[JobFields]:
+    """Look up a job in the hot table, falling back to the archive."""
+    return db.get(Job, job_id) or find_archived_job(db, job_id)
+
+
+# ---------------- Postgres partitions ----------------
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _month_start(ts: datetime) -> datetime:
+    return datetime(ts.year, ts.month, 1)
+
+
+def _next_month(ts: datetime) -> datetime:
+    return datetime(ts.year + ts.month // 12, ts.month % 12 + 1, 1)
+
+
+def _partition_name(month: datetime) -> str:
+    return f"{JobArchive.__tablename__}_p{month:%Y%m}"
+
+
+def ensure_partitions(db: Session, oldest: datetime, newest: datetime) -> None:
+    """Create monthly archive partitions covering [oldest, newest] (Postgres only)."""
+    if not _is_postgres(db):
+        return
+    month = _month_start(oldest)
+    while month <= newest:
+        upper = _next_month(month)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} "
+            f"PARTITION OF {JobArchive.__tablename__} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        ))
+        month = upper
+
+
+# ---------------- Compactor ----------------
+def compact(db: Session, *, hot_days: int, batch_size: int, now: Optional[datetime] = None) -> int:
+    """Move terminal jobs completed more than `hot_days` ago into the archive.
+
+    Works in batches of `batch_size`, committing after each, so the hot table
+    is never locked for long. Returns the number of rows moved.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=hot_days)
+    moved = 0
+    while True:
+        rows = db.execute(
+            select(Job.id, Job.completed_at)
+            .where(Job.status.in_(TERMINAL_STATUSES), Job.completed_at < cutoff)
+            .order_by(Job.completed_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            break
+
+        ids = [r.id for r in rows]
+        ensure_partitions(db, rows[0].completed_at, rows[-1].completed_at)
+        db.execute(
+            insert(JobArchive).from_select(
+                _COPY_COLUMNS,
+                select(*[Job.__table__.c[name] for name in _COPY_COLUMNS]).where(Job.id.in_(ids)),
+            )
+        )
+        db.execute(delete(Job).where(Job.id.in_(ids)))
+        db.commit()
+
+        moved += len(ids)
+        JOBS_ARCHIVED.inc(len(ids))
+        if len(ids) < batch_size:
+            break
+    return moved
+
+
+def purge_archive(db: Session, *, archive_days: int, now: Optional[datetime] = None) -> None:
+    """Drop archived jobs completed more than `archive_days` ago.
+
+    On Postgres whole monthly partitions are dropped once they are entirely
+    past the cutoff, which is far cheaper than a bulk DELETE.
+    """
+    if archive_days <= 0:
+        return
+    cutoff = (now or datetime.utcnow()) - timedelta(days=archive_days)
+    if _is_postgres(db):
+        names = db.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :parent"
+        ), {"parent": JobArchive.__tablename__}).scalars().all()
+        prefix = f"{JobArchive.__tablename__}_p"
+        for name in names:
+            month = datetime.strptime(name[len(prefix):], "%Y%m")
+            if _next_month(month) <= cutoff:
+                db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    else:
+        db.execute(delete(JobArchive).where(JobArchive.completed_at < cutoff))
+    db.commit()
+
+
+def run_once(cfg: Optional[dict] = None) -> int:
+    cfg = cfg or load_retention_config()
+    db = SessionLocal()
+    try:
+        moved = compact(db, hot_days=cfg["hot_days"], batch_size=cfg["batch_size"])
+        purge_archive(db, archive_days=cfg["archive_days"])
+        return moved
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# ---------------- Entrypoint ----------------
+def main():
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    cfg = load_retention_config()
+    while True:
+        try:
+            moved = run_once(cfg)
+            if moved:
+                logger.info(f"[{hostname}] Archived {moved} jobs")
+        except Exception as e:
+            logger.error(f"[{hostname}] Compaction failed: {e}")
+        try:
+            with SessionLocal() as db:
+                sweep_stale_groups(db)
+        except Exception as e:
+            logger.error(f"[{hostname}] Group sweep failed: {e}")
+        time.sleep(cfg["interval"])
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,19 @@ def load_retry_config():
         "jitter_ratio": float(os.getenv("JITTER_RATIO", 0.5)),
     }
 
+class PermanentError(Exception):
+    """Raised by handlers for failures that retrying cannot fix."""
+
+
+# Errors that signal bad input or a programming bug rather than a flaky downstream
+NON_RETRYABLE = (PermanentError, ValueError, TypeError, KeyError)
+
+
+def is_retryable(err: Exception) -> bool:
+    """Default classifier: everything is transient unless listed in NON_RETRYABLE."""
+    return not isinstance(err, NON_RETRYABLE)
+
+
 def retry_with_jitter(
     *,
     max_attempts=5,
@@ -22,8 +35,15 @@ def retry_with_jitter(
     jitter_ratio=0.5,
     exceptions=(Exception,),
     on_retry=None,
+    retryable=None,
+    budget=None,
 ):
-    """Decorator that retries with exponential backoff + jitter."""
+    """Decorator that retries with exponential backoff + jitter.
+
+    `retryable(err)` can veto a retry for errors caught by `exceptions`.
+    `budget` (see app.breaker.RetryBudget) is asked before every retry and
+    told about every success, so retries can be capped across callers.
+    """
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
@@ -31,10 +51,14 @@ def retry_with_jitter(
             while True:
                 try:
                     attempt += 1
-                    return fn(*args, **kwargs)
+                    result = fn(*args, **kwargs)
                 except exceptions as err:
                     if attempt >= max_attempts:
                         raise
+                    if retryable and not retryable(err):
+                        raise
+                    if budget and not budget.can_retry():
+                        raise
                     base = base_delay * (backoff ** (attempt - 1))
                     low = base * (1 - jitter_ratio)
                     high = base * (1 + jitter_ratio)
@@ -42,5 +66,9 @@ def retry_with_jitter(
                     if on_retry:
                         on_retry(attempt, err, sleep_s)
                     time.sleep(sleep_s)
+                else:
+                    if budget:
+                        budget.record_success()
+                    return result
         return wrapper
     return decorator
\ No newline at end of file
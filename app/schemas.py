@@ -0,0 +1,57 @@
+import hashlib
+from typing import Any, List, Optional
+from pydantic import BaseModel, ConfigDict, Field, StrictBool, ValidationError, field_validator
+
+
+# ---------------- Request envelope ----------------
+class JobRequest(BaseModel):
+    """Body of POST /v1/jobs. Payload is validated separately per job type."""
+
+    type: Optional[str] = None
+    payload: Optional[dict] = None
+    idempotencyKey: Optional[str] = Field(default=None, max_length=128)
+
+
+class GroupRequest(BaseModel):
+    """Body of POST /v1/groups: one child job per payload, all of the same type."""
+
+    type: Optional[str] = None
+    payloads: List[dict] = Field(min_length=1)
+    reducer: Optional[str] = None
+    idempotencyKey: Optional[str] = Field(default=None, max_length=128)
+
+
+# ---------------- Per job-type payloads ----------------
+# shake_* digests need an explicit length, which the hash job does not take
+HASH_ALGORITHMS = frozenset(a for a in hashlib.algorithms_available if not a.startswith("shake_"))
+
+
+class HashPayload(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    algo: str = "sha256"
+    data: Any = ""
+    fail: StrictBool = False  # used by integration tests to force a failure
+
+    @field_validator("algo")
+    @classmethod
+    def _known_algo(cls, v: str) -> str:
+        if v not in HASH_ALGORITHMS:
+            raise ValueError(f"unsupported hash algorithm {v!r}")
+        return v
+
+
+class BlockIpPayload(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    ip: str = Field(min_length=1)
+    reason: str = "policy"
+
+
+def describe_payload_error(job_type: str, err: ValidationError) -> str:
+    """Turn the first pydantic error into the API's 400 detail message."""
+    first = err.errors()[0]
+    field = ".".join(str(p) for p in first["loc"])
+    if first["type"] in ("missing", "string_too_short"):
+        return f"{job_type} requires '{field}' in payload"
+    return f"Invalid payload for {job_type}: '{field}' {first['msg']}"
@@ -0,0 +1,76 @@
+import bisect
+import hashlib
+import logging
+from collections import defaultdict
+from typing import List
+
+from rq import Queue
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring over named nodes, with virtual replicas per node.
+
+    Nodes are placed by name (e.g. their Redis URL), so adding or removing a
+    node only remaps the keys that land on its own replicas.
+    """
+
+    def __init__(self, names: List[str], replicas: int = 100):
+        points = sorted(
+            (_hash(f"{name}#{r}"), idx)
+            for idx, name in enumerate(names)
+            for r in range(replicas)
+        )
+        self._hashes = [h for h, _ in points]
+        self._nodes = [idx for _, idx in points]
+
+    def node_for(self, key: str) -> int:
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[i]
+
+
+class ShardedQueue:
+    """One RQ queue per Redis node; jobs are routed by consistent hashing."""
+
+    def __init__(self, name: str, connections: list, names: List[str]):
+        self.queues = [Queue(name, connection=conn) for conn in connections]
+        self._ring = HashRing(names)
+
+    def queue_for(self, shard_key: str) -> Queue:
+        return self.queues[self._ring.node_for(shard_key)]
+
+    def enqueue(self, shard_key: str, func, *args, **kwargs):
+        return self.queue_for(shard_key).enqueue(func, *args, **kwargs)
+
+    def connection_for(self, shard_key: str):
+        return self.queue_for(shard_key).connection
+
+    def enqueue_many(self, items):
+        """Enqueue `(shard_key, func, args)` items with one pipeline per shard."""
+        by_shard = defaultdict(list)
+        for key, func, args in items:
+            by_shard[self._ring.node_for(key)].append(Queue.prepare_data(func, args=args))
+        for idx, datas in by_shard.items():
+            self.queues[idx].enqueue_many(datas)
+
+    def enqueue_in(self, shard_key: str, time_delta, func, *args, **kwargs):
+        return self.queue_for(shard_key).enqueue_in(time_delta, func, *args, **kwargs)
+
+    def depths(self) -> List[int]:
+        """Per-shard queue length; unreachable shards count as 0 (fail-open)."""
+        out = []
+        for q in self.queues:
+            try:
+                out.append(len(q))
+            except Exception as e:
+                logger.warning(f"Queue depth unavailable for {q.connection}: {e}")
+                out.append(0)
+        return out
+
+    def __len__(self):
+        return sum(self.depths())
@@ -2,13 +2,16 @@ import json
 import hashlib
 import socket
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from .db import SessionLocal
-from .models import Job, JobStatus
-from .redis import queue
-from .retry import retry_with_jitter, load_retry_config
-from .metrics import JOBS_PROCESSED
+from .models import Job, JobStatus, TERMINAL_STATUSES
+from .redis import queue, shard_key
+from .retry import retry_with_jitter, load_retry_config, is_retryable
+from .breaker import CircuitOpenError, get_breaker, get_budget, load_breaker_config
+from .metrics import JOBS_PROCESSED, BREAKER_REJECTED
+from .schemas import HashPayload, BlockIpPayload
+from .groups import record_child_done
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -56,13 +59,13 @@ def compensate_block_ip(state: dict):
 
 # ---------------- Registry ----------------
 JOB_TYPES = {
-    "hash": {"execute": execute_hash, "compensate": compensate_hash},
-    "block_ip": {"execute": execute_block_ip, "compensate": compensate_block_ip},
+    "hash": {"execute": execute_hash, "compensate": compensate_hash, "payload": HashPayload},
+    "block_ip": {"execute": execute_block_ip, "compensate": compensate_block_ip, "payload": BlockIpPayload},
 }
 
 
 def enqueue_job(job_id: str, job_type: str, payload: dict):
-    queue.enqueue(process_job, job_id, job_type, payload)
+    queue.enqueue(shard_key(job_id, job_type), process_job, job_id, job_type, payload)
 
 
 # ---------------- Retry + runner ----------------
@@ -73,16 +76,62 @@ def _on_retry(attempt: int, err: Exception, sleep_s: float):
     logger.warning(f"[{hostname}] Retry {attempt} after error: {err}, sleeping {sleep_s:.2f}s")
 
 
-@retry_with_jitter(
-    max_attempts=_cfg["max_attempts"],
-    base_delay=_cfg["base_delay"],
-    backoff=_cfg["backoff"],
-    jitter_ratio=_cfg["jitter_ratio"],
-    exceptions=(RuntimeError, ValueError, Exception),
-    on_retry=_on_retry,
-)
-def _run(handler, payload):
-    return handler(payload)
+_breaker_cfg = load_breaker_config()
+
+
+def _make_runner(job_type: str):
+    """Build the retrying runner for one job type, sharing its budget and breaker."""
+    breaker = get_breaker(job_type)
+    budget = get_budget(job_type)
+
+    runner = retry_with_jitter(
+        max_attempts=_cfg["max_attempts"],
+        base_delay=_cfg["base_delay"],
+        backoff=_cfg["backoff"],
+        jitter_ratio=_cfg["jitter_ratio"],
+        exceptions=(Exception,),
+        on_retry=_on_retry,
+        retryable=is_retryable,
+        budget=budget,
+    )(lambda handler, payload: handler(payload))
+
+    def _run_job(handler, payload):
+        # The breaker admits and sees one outcome per job, not per attempt,
+        # so a single bad job cannot open it for the whole job type and a
+        # half-open probe keeps its retries
+        if not breaker.allow():
+            raise CircuitOpenError(f"circuit open for job type {job_type}")
+        try:
+            result = runner(handler, payload)
+        except Exception as e:
+            if is_retryable(e):
+                breaker.record_failure()
+            raise
+        breaker.record_success()
+        return result
+
+    return _run_job
+
+
+_runners = {}
+
+
+def _run(job_type, handler, payload):
+    if job_type not in _runners:
+        _runners[job_type] = _make_runner(job_type)
+    return _runners[job_type](handler, payload)
+
+
+def _park(db, job, job_type: str, payload: dict):
+    """Put a job back on the queue until the breaker's cooldown has passed."""
+    job.status = JobStatus.QUEUED.value
+    db.commit()
+    queue.enqueue_in(
+        shard_key(job.id, job_type),
+        timedelta(seconds=_breaker_cfg["cooldown"]),
+        process_job, job.id, job_type, payload,
+    )
+    logger.info(f"[{hostname}] Job {job.id} PARKED for {_breaker_cfg['cooldown']}s (circuit open)")
 
 
 # ---------------- Worker entrypoint ----------------
@@ -93,6 +142,10 @@ def process_job(job_id: str, job_type: str, payload: dict):
         if not job:
             logger.warning(f"[{hostname}] Job {job_id} not found")
             return
+        if job.status in TERMINAL_STATUSES:
+            # e.g. a group child failed by fail_group after it reached a healthy shard
+            logger.info(f"[{hostname}] Job {job_id} already {job.status}; skipping")
+            return
 
         job.status = JobStatus.RUNNING.value
         if not job.started_at:
@@ -102,7 +155,14 @@ def process_job(job_id: str, job_type: str, payload: dict):
         logger.info(f"[{hostname}] Starting job {job_id} type={job_type}")
 
         # run actual executor
-        result = _run(JOB_TYPES[job_type]["execute"], payload)
+        try:
+            result = _run(job_type, JOB_TYPES[job_type]["execute"], payload)
+        except CircuitOpenError:
+            BREAKER_REJECTED.labels(type=job_type).inc()
+            if _breaker_cfg["mode"] != "park":
+                raise
+            _park(db, job, job_type, payload)
+            return
 
         # mark success
         job.status = JobStatus.SUCCEEDED.value
@@ -115,6 +175,9 @@ def process_job(job_id: str, job_type: str, payload: dict):
         JOBS_PROCESSED.labels(status="SUCCEEDED").inc()
         logger.info(f"[{hostname}] Job {job_id} SUCCEEDED")
 
+        if job.group_id:
+            record_child_done(job.group_id, job_id, job.status)
+
     except Exception as e:
         job = db.get(Job, job_id) if "job" not in locals() else job
         if job:
@@ -144,5 +207,8 @@ def process_job(job_id: str, job_type: str, payload: dict):
             finally:
                 job.completed_at = datetime.utcnow()
                 db.commit()
+
+            if job.group_id:
+                record_child_done(job.group_id, job_id, job.status)
     finally:
         db.close()
\ No newline at end of file
@@ -0,0 +1,107 @@
+import os
+import socket
+import logging
+import threading
+
+from rq import Worker
+from rq.scheduler import RQScheduler
+from dotenv import load_dotenv
+
+from .redis import queue
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+hostname = socket.gethostname()
+
+
+def load_worker_config():
+    """Pull shard assignment and work-stealing knobs from environment (.env)."""
+    return {
+        "shard": int(os.getenv("WORKER_SHARD", 0)),
+        "steal": os.getenv("WORKER_STEAL", "true").lower() == "true",
+        "idle_before_steal": int(os.getenv("STEAL_AFTER", 5)),
+        "steal_min_depth": int(os.getenv("STEAL_MIN_DEPTH", 10)),
+        "steal_batch": int(os.getenv("STEAL_BATCH", 20)),
+        "schedule_interval": float(os.getenv("SCHEDULE_INTERVAL", 1)),
+    }
+
+
+def promote_scheduled(q):
+    """Move due `enqueue_in` jobs (e.g. parked jobs) onto their queue."""
+    scheduler = RQScheduler([q], connection=q.connection)
+    scheduler.acquire_locks()
+    if scheduler.acquired_locks:
+        scheduler.enqueue_scheduled_jobs()
+        scheduler.release_locks()
+
+
+def start_promoter(q, interval: float) -> threading.Event:
+    """Promote due scheduled jobs on `q` every `interval` seconds in a background thread.
+
+    Runs independently of the work loop, so parked jobs come back even while
+    the shard is never idle. Set the returned event to stop it.
+    """
+    stop = threading.Event()
+
+    def _loop():
+        while not stop.wait(interval):
+            try:
+                promote_scheduled(q)
+            except Exception as e:
+                logger.warning(f"[{hostname}] Could not promote scheduled jobs: {e}")
+
+    threading.Thread(target=_loop, name="scheduler", daemon=True).start()
+    return stop
+
+
+def steal(workers, home: int, *, min_depth: int, batch: int) -> bool:
+    """Drain up to `batch` jobs from the deepest other shard at or above `min_depth`.
+
+    Returns True if a shard was stolen from.
+    """
+    depths = queue.depths()
+    candidates = [i for i in range(len(workers)) if i != home and depths[i] >= min_depth]
+    if not candidates:
+        return False
+    victim = max(candidates, key=lambda i: depths[i])
+    logger.info(f"[{hostname}] Stealing from shard {victim} (depth={depths[victim]})")
+    workers[victim].work(burst=True, max_jobs=batch)
+    return True
+
+
+def _stopping(workers) -> bool:
+    # RQ routes SIGINT/SIGTERM to whichever worker last ran work(), which is
+    # the victim after a steal, so check every worker
+    return any(w._stop_requested for w in workers)
+
+
+def serve(workers, home: int, cfg: dict) -> None:
+    """Work the home shard, stealing from other shards while it is idle, until stopped."""
+    while not _stopping(workers):
+        # Block on the home shard; returns once it has been idle for a while
+        workers[home].work(max_idle_time=cfg["idle_before_steal"])
+        if _stopping(workers):
+            break
+        if cfg["steal"] and len(workers) > 1:
+            steal(workers, home, min_depth=cfg["steal_min_depth"], batch=cfg["steal_batch"])
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    cfg = load_worker_config()
+    home = cfg["shard"]
+    workers = [Worker([q], connection=q.connection) for q in queue.queues]
+    logger.info(f"[{hostname}] Worker on shard {home}/{len(workers)} (steal={cfg['steal']})")
+
+    stop_promoter = start_promoter(queue.queues[home], cfg["schedule_interval"])
+    try:
+        serve(workers, home, cfg)
+    finally:
+        stop_promoter.set()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import json
+import pytest
+
+import app.main as main
+import app.tasks as tasks
+from app import db as app_db
+from app.models import Job, JobStatus
+
+
+class FakeQueue:
+    def __init__(self):
+        self.enqueued = []
+
+    def __len__(self):
+        return len(self.enqueued)
+
+    def enqueue(self, shard_key, fn, *args):
+        self.enqueued.append(args)
+
+
+@pytest.fixture
+def fake_queue(monkeypatch):
+    q = FakeQueue()
+    monkeypatch.setattr(main, "queue", q)
+    monkeypatch.setattr(tasks, "queue", q)
+    return q
+
+
+@pytest.mark.parametrize("body, detail", [
+    ({"payload": {"data": "x"}}, "Missing job type"),
+    ({"type": "nope"}, "Unsupported job type: nope"),
+    ({"type": "block_ip", "payload": {}}, "block_ip requires 'ip' in payload"),
+    ({"type": "block_ip", "payload": {"ip": ""}}, "block_ip requires 'ip' in payload"),
+    ({"type": "hash", "payload": {"algo": 5}}, "Invalid payload for hash: 'algo'"),
+    ({"type": "hash", "payload": {"algo": "nope"}}, "Invalid payload for hash: 'algo'"),
+    ({"type": "hash", "payload": {"algo": "shake_128"}}, "Invalid payload for hash: 'algo'"),
+    ({"type": "hash", "payload": {"fail": "no"}}, "Invalid payload for hash: 'fail'"),
+])
+def test_create_job_rejects_invalid_requests(client, fake_queue, body, detail):
+    r = client.post("/v1/jobs", json=body)
+    assert r.status_code == 400
+    assert detail in r.json()["detail"]
+    assert fake_queue.enqueued == []
+
+
+def test_create_job_rejects_malformed_json(client, fake_queue):
+    r = client.post("/v1/jobs", content=b"{not json", headers={"Content-Type": "application/json"})
+    assert r.status_code == 400
+
+
+def test_create_job_enqueues_validated_payload(client, fake_queue):
+    r = client.post("/v1/jobs", json={
+        "type": "block_ip",
+        "payload": {"ip": "192.168.1.123", "note": "kept"},
+        "idempotencyKey": "k1",
+    })
+    assert r.status_code == 200
+    job_id = r.json()["jobId"]
+    assert fake_queue.enqueued == [(job_id, "block_ip", {"ip": "192.168.1.123", "note": "kept"})]
+
+    again = client.post("/v1/jobs", json={"type": "block_ip", "payload": {"ip": "10.0.0.1"}, "idempotencyKey": "k1"})
+    assert again.json()["jobId"] == job_id
+    assert len(fake_queue.enqueued) == 1
+
+
+def test_result_json_is_passed_through(client):
+    with app_db.SessionLocal() as db:
+        db.add(Job(
+            id="done",
+            job_type="hash",
+            status=JobStatus.SUCCEEDED.value,
+            result_json=json.dumps({"algo": "sha256", "digest": "abc", "worker": "w1"}),
+        ))
+        db.add(Job(id="queued", job_type="hash", status=JobStatus.QUEUED.value))
+        db.commit()
+
+    r = client.get("/v1/jobs/done")
+    assert r.status_code == 200
+    assert r.json()["result"] == {"algo": "sha256", "digest": "abc", "worker": "w1"}
+
+    listed = {j["id"]: j for j in client.get("/v1/jobs").json()}
+    assert listed["done"]["result"]["digest"] == "abc"
+    assert "result" not in listed["queued"]
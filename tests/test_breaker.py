@@ -0,0 +1,116 @@
+import time
+
+import fakeredis
+import pytest
+
+import app.breaker as breaker_mod
+import app.tasks as tasks
+from app.breaker import CircuitBreaker, RetryBudget
+from app.sharding import ShardedQueue
+
+
+@pytest.fixture
+def conn():
+    return fakeredis.FakeRedis()
+
+
+def test_breaker_opens_after_threshold_and_half_opens(conn):
+    breaker = CircuitBreaker("hash", threshold=3, window=30, cooldown=30, connection=conn)
+
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    # cooldown elapsed -> half-open: a single failure reopens it
+    conn.delete("breaker:hash:open")
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    # a success while half-open closes it for good
+    conn.delete("breaker:hash:open")
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow()
+
+
+def test_success_while_open_keeps_breaker_half_open(conn):
+    breaker = CircuitBreaker("hash", threshold=1, window=30, cooldown=30, connection=conn)
+    breaker.record_failure()
+
+    # a job admitted before the trip finishes while the breaker is OPEN
+    breaker.record_success()
+
+    conn.delete("breaker:hash:open")  # cooldown elapsed
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+
+def test_half_open_admits_a_single_probe(conn):
+    breaker = CircuitBreaker("hash", threshold=1, window=30, cooldown=30, connection=conn)
+    breaker.record_failure()
+    conn.delete("breaker:hash:open")
+
+    assert breaker.allow()
+    assert not breaker.allow()  # everyone else waits for the probe
+
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_retry_budget_scales_with_successes(conn):
+    budget = RetryBudget("hash", ratio=0.5, min_retries=1, window=60, connection=conn)
+
+    assert budget.can_retry()
+    assert not budget.can_retry()
+
+    for _ in range(4):
+        budget.record_success()
+    assert budget.can_retry()
+    assert budget.can_retry()
+    assert not budget.can_retry()
+
+
+def test_successes_do_not_reset_closed_breaker(conn):
+    breaker = CircuitBreaker("hash", threshold=3, window=30, cooldown=30, connection=conn)
+
+    # a mostly-failing downstream with the odd success still trips it
+    for _ in range(3):
+        breaker.record_failure()
+        breaker.record_success()
+    assert not breaker.allow()
+
+
+def test_one_failing_job_does_not_open_breaker(conn, monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda s: None)
+    breaker = CircuitBreaker("hash", threshold=5, window=30, cooldown=30, connection=conn)
+    budget = RetryBudget("hash", ratio=0.2, min_retries=10, window=60, connection=conn)
+    monkeypatch.setitem(breaker_mod._breakers, "hash", breaker)
+    monkeypatch.setitem(breaker_mod._budgets, "hash", budget)
+    monkeypatch.setattr(tasks, "_runners", {})
+    monkeypatch.setitem(tasks._cfg, "max_attempts", 5)
+
+    with pytest.raises(RuntimeError):
+        tasks._run("hash", tasks.execute_hash, {"fail": True})
+    assert breaker.allow()
+
+    assert tasks._run("hash", tasks.execute_hash, {"data": "ok"})["algo"] == "sha256"
+
+
+def test_breaker_and_budget_are_placed_on_the_ring_by_job_type(monkeypatch):
+    shards = [fakeredis.FakeRedis(server=fakeredis.FakeServer()) for _ in range(3)]
+    q = ShardedQueue("tasksvc", shards, ["redis://a", "redis://b", "redis://c"])
+    monkeypatch.setattr(breaker_mod, "queue", q)
+
+    for job_type in ("hash", "block_ip"):
+        breaker = CircuitBreaker(job_type, threshold=1, window=30, cooldown=30)
+        budget = RetryBudget(job_type, ratio=0.2, min_retries=1, window=10)
+        assert breaker.conn is budget.conn is q.connection_for(job_type)
+
+        breaker.record_failure()
+        assert breaker.conn.exists(f"breaker:{job_type}:open")
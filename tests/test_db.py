@@ -0,0 +1,32 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app.db import upgrade_schema
+
+
+def test_upgrade_schema_adds_missing_columns_and_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    # `jobs` as created by the original release
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE jobs ("
+            " id VARCHAR(36) PRIMARY KEY, job_type VARCHAR(64) NOT NULL, payload TEXT,"
+            " idempotency_key VARCHAR(128), status VARCHAR(32) NOT NULL, attempts INTEGER NOT NULL,"
+            " started_at DATETIME, completed_at DATETIME, created_at DATETIME NOT NULL,"
+            " last_error TEXT, compensation_error TEXT, result_json TEXT)"
+        ))
+        conn.execute(text("CREATE INDEX ix_jobs_idempotency_key ON jobs (idempotency_key)"))
+        conn.execute(text(
+            "INSERT INTO jobs (id, job_type, status, attempts, created_at)"
+            " VALUES ('j1', 'hash', 'SUCCEEDED', 1, '2025-01-01')"
+        ))
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)  # idempotent
+
+    insp = inspect(engine)
+    columns = {c["name"] for c in insp.get_columns("jobs")}
+    assert {"group_id", "group_index"} <= columns
+    indexes = {i["name"] for i in insp.get_indexes("jobs")}
+    assert {"ix_jobs_completed_at", "ix_jobs_group_id"} <= indexes
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT group_id FROM jobs WHERE id = 'j1'")).scalar() is None
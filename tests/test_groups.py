@@ -0,0 +1,216 @@
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+import redis
+from rq import SimpleWorker
+
+import app.groups as groups
+import app.main as main
+from app import db as app_db
+import app.tasks as tasks
+from app.models import Job, JobGroup
+from app.retention import compact
+from app.sharding import ShardedQueue
+
+
+@pytest.fixture
+def sharded(monkeypatch):
+    names = ["redis://a", "redis://b"]
+    q = ShardedQueue("tasksvc", [fakeredis.FakeRedis(server=fakeredis.FakeServer()) for _ in names], names)
+    for module in (main, tasks, groups):
+        monkeypatch.setattr(module, "queue", q)
+    # keep breaker/budget state out of these tests
+    monkeypatch.setattr(tasks, "_run", lambda job_type, handler, payload: handler(payload))
+    return q
+
+
+def _drain(q):
+    for _ in range(2):  # second pass picks up finalize_group
+        for sq in q.queues:
+            SimpleWorker([sq], connection=sq.connection).work(burst=True)
+
+
+def test_group_fans_out_and_reduces(client, sharded):
+    r = client.post("/v1/groups", json={
+        "type": "hash",
+        "payloads": [{"data": "a"}, {"data": "b"}, {"fail": True}],
+        "reducer": "combined_digest",
+    })
+    assert r.status_code == 200
+    group_id = r.json()["groupId"]
+    assert len(r.json()["jobIds"]) == 3
+    assert len(sharded) == 3
+
+    running = client.get(f"/v1/groups/{group_id}").json()
+    assert running["status"] == "RUNNING"
+    assert (running["total"], running["done"]) == (3, 0)
+
+    _drain(sharded)
+
+    done = client.get(f"/v1/groups/{group_id}").json()
+    assert done["status"] == "SUCCEEDED"
+    assert (done["done"], done["succeeded"], done["compensated"]) == (3, 2, 1)
+    assert done["result"]["count"] == 2
+    assert len(done["result"]["digest"]) == 64
+
+
+def test_group_status_falls_back_to_db(client, sharded):
+    r = client.post("/v1/groups", json={"type": "block_ip", "payloads": [{"ip": "10.0.0.1"}], "reducer": "collect"})
+    group_id = r.json()["groupId"]
+    _drain(sharded)
+
+    groups._conn(group_id).delete(groups._key(group_id))
+
+    resp = client.get(f"/v1/groups/{group_id}").json()
+    assert resp["status"] == "SUCCEEDED"
+    assert resp["done"] == 1
+    assert resp["result"]["results"][0]["ip"] == "10.0.0.1"
+
+
+def test_idempotent_replay_returns_same_job_ids(client, sharded):
+    body = {"type": "hash", "payloads": [{"data": str(i)} for i in range(12)], "idempotencyKey": "replay"}
+    first = client.post("/v1/groups", json=body).json()
+    again = client.post("/v1/groups", json=body).json()
+
+    assert again == first
+    assert len(sharded) == 12
+
+
+def test_sweep_finalizes_group_with_lost_counter_updates(client, sharded, monkeypatch):
+    # simulate a Redis blip: no child completion reaches the counters
+    monkeypatch.setattr(tasks, "record_child_done", lambda *args: None)
+    r = client.post("/v1/groups", json={"type": "hash", "payloads": [{"data": "a"}, {"data": "b"}]})
+    group_id = r.json()["groupId"]
+    assert groups._conn(group_id).ttl(groups._key(group_id)) > 0  # running hash expires too
+
+    _drain(sharded)
+    assert client.get(f"/v1/groups/{group_id}").json()["status"] == "RUNNING"
+
+    with app_db.SessionLocal() as db:
+        assert groups.sweep_stale_groups(db, older_than=0) == 1
+        assert groups.sweep_stale_groups(db, older_than=0) == 0
+
+    resp = client.get(f"/v1/groups/{group_id}").json()
+    assert resp["status"] == "SUCCEEDED"
+    assert resp["succeeded"] == 2
+
+
+def test_sweep_and_reducer_include_archived_children(client, sharded, monkeypatch):
+    monkeypatch.setattr(tasks, "record_child_done", lambda *args: None)
+    r = client.post("/v1/groups", json={
+        "type": "block_ip",
+        "payloads": [{"ip": "10.0.0.1"}, {"ip": "10.0.0.2"}],
+        "reducer": "collect",
+    })
+    group_id, (first, second) = r.json()["groupId"], r.json()["jobIds"]
+
+    # the first child finishes and is archived before the second one runs
+    tasks.process_job(first, "block_ip", {"ip": "10.0.0.1"})
+    with app_db.SessionLocal() as db:
+        assert compact(db, hot_days=0, batch_size=10, now=datetime.utcnow() + timedelta(seconds=1)) == 1
+        tasks.process_job(second, "block_ip", {"ip": "10.0.0.2"})
+        assert groups.sweep_stale_groups(db, older_than=0) == 1
+
+    resp = client.get(f"/v1/groups/{group_id}").json()
+    assert (resp["status"], resp["succeeded"]) == ("SUCCEEDED", 2)
+    assert [res["ip"] for res in resp["result"]["results"]] == ["10.0.0.1", "10.0.0.2"]
+
+
+def _redis_down(*args, **kwargs):
+    raise redis.ConnectionError("shard unavailable")
+
+
+def test_group_is_not_persisted_when_counters_cannot_be_seeded(client, sharded, monkeypatch):
+    monkeypatch.setattr(main, "start_group", _redis_down)
+
+    r = client.post("/v1/groups", json={"type": "hash", "payloads": [{"data": "a"}], "idempotencyKey": "g"})
+    assert r.status_code == 503
+
+    with app_db.SessionLocal() as db:
+        assert db.query(JobGroup).count() == 0
+        assert db.query(Job).count() == 0
+    assert len(sharded) == 0
+
+
+def test_group_is_failed_when_children_cannot_be_enqueued(client, sharded, monkeypatch):
+    monkeypatch.setattr(sharded, "enqueue_many", _redis_down)
+
+    body = {"type": "hash", "payloads": [{"data": "a"}, {"data": "b"}], "idempotencyKey": "g"}
+    assert client.post("/v1/groups", json=body).status_code == 503
+
+    with app_db.SessionLocal() as db:
+        group = db.query(JobGroup).one()
+        assert group.status == "FAILED"
+        assert {j.status for j in db.query(Job)} == {"FAILED"}
+
+    # a replay sees the failed group rather than a RUNNING one that never ends
+    group_id = client.post("/v1/groups", json=body).json()["groupId"]
+    assert client.get(f"/v1/groups/{group_id}").json()["status"] == "FAILED"
+
+
+def test_children_enqueued_before_a_shard_failure_stay_failed(client, sharded, monkeypatch):
+    enqueue_many = sharded.enqueue_many
+
+    def _second_shard_down(items):
+        enqueue_many([i for i in items if sharded.queue_for(i[0]) is sharded.queues[0]])
+        raise redis.ConnectionError("shard unavailable")
+
+    monkeypatch.setattr(sharded, "enqueue_many", _second_shard_down)
+    body = {"type": "hash", "payloads": [{"data": str(i)} for i in range(8)]}
+    assert client.post("/v1/groups", json=body).status_code == 503
+    assert len(sharded) > 0  # some children did reach the healthy shard
+
+    _drain(sharded)
+
+    with app_db.SessionLocal() as db:
+        assert {j.status for j in db.query(Job)} == {"FAILED"}
+        assert db.query(JobGroup).one().status == "FAILED"
+
+
+def test_redelivered_child_is_counted_once(sharded):
+    group_id = "g1"
+    groups._conn(group_id).hset(groups._key(group_id), mapping={"total": 2, "done": 0, "SUCCEEDED": 0})
+
+    groups.record_child_done(group_id, "child-1", "SUCCEEDED")
+    groups.record_child_done(group_id, "child-1", "SUCCEEDED")
+
+    assert int(groups._conn(group_id).hget(groups._key(group_id), "done")) == 1
+    assert len(sharded) == 0  # finalize not triggered yet
+
+
+def test_late_child_does_not_recreate_cleared_counters(client, sharded):
+    r = client.post("/v1/groups", json={"type": "hash", "payloads": [{"data": "a"}, {"data": "b"}]})
+    group_id = r.json()["groupId"]
+    groups._conn(group_id).delete(groups._key(group_id))  # expired, or cleared by fail_group
+
+    groups.record_child_done(group_id, r.json()["jobIds"][0], "SUCCEEDED")
+    assert not groups._conn(group_id).exists(groups._key(group_id))
+
+    resp = client.get(f"/v1/groups/{group_id}")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "RUNNING"
+
+
+def test_partial_counters_are_treated_as_a_miss(client, sharded):
+    r = client.post("/v1/groups", json={"type": "hash", "payloads": [{"data": "a"}]})
+    group_id = r.json()["groupId"]
+    groups._conn(group_id).hdel(groups._key(group_id), "type", "total")
+
+    resp = client.get(f"/v1/groups/{group_id}")
+    assert resp.status_code == 200
+    assert (resp.json()["type"], resp.json()["total"]) == ("hash", 1)
+
+
+@pytest.mark.parametrize("body, detail", [
+    ({"type": "hash", "payloads": []}, "Invalid request body"),
+    ({"type": "hash", "payloads": [{}], "reducer": "nope"}, "Unsupported reducer: nope"),
+    ({"type": "block_ip", "payloads": [{"ip": "1.1.1.1"}], "reducer": "combined_digest"},
+     "Reducer combined_digest does not support job type block_ip"),
+    ({"type": "block_ip", "payloads": [{"ip": "1.1.1.1"}, {}]}, "payloads[1]: block_ip requires 'ip' in payload"),
+])
+def test_create_group_rejects_invalid_requests(client, sharded, body, detail):
+    r = client.post("/v1/groups", json=body)
+    assert r.status_code == 400
+    assert detail in r.json()["detail"]
+    assert len(sharded) == 0
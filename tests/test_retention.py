@@ -0,0 +1,65 @@
+import json
+from datetime import datetime, timedelta
+
+from app import db as app_db
+from app.models import Job, JobArchive, JobStatus
+from app.retention import compact, purge_archive
+
+NOW = datetime(2025, 9, 1, 12, 0, 0)
+
+
+def _add_job(db, job_id, status, completed_days_ago=None, idempotency_key=None):
+    completed_at = NOW - timedelta(days=completed_days_ago) if completed_days_ago is not None else None
+    db.add(Job(
+        id=job_id,
+        job_type="hash",
+        status=status,
+        attempts=1,
+        created_at=NOW - timedelta(days=30),
+        completed_at=completed_at,
+        idempotency_key=idempotency_key,
+        result_json=json.dumps({"digest": job_id}),
+    ))
+    db.commit()
+
+
+def test_compact_moves_only_old_terminal_jobs(client):
+    with app_db.SessionLocal() as db:
+        _add_job(db, "old-ok", JobStatus.SUCCEEDED.value, completed_days_ago=10)
+        _add_job(db, "old-comp", JobStatus.COMPENSATED.value, completed_days_ago=9)
+        _add_job(db, "fresh-ok", JobStatus.SUCCEEDED.value, completed_days_ago=1)
+        _add_job(db, "queued", JobStatus.QUEUED.value)
+
+        moved = compact(db, hot_days=7, batch_size=1, now=NOW)
+
+        assert moved == 2
+        assert {j.id for j in db.query(Job)} == {"fresh-ok", "queued"}
+        assert {j.id for j in db.query(JobArchive)} == {"old-ok", "old-comp"}
+
+
+def test_get_job_falls_back_to_archive(client):
+    with app_db.SessionLocal() as db:
+        _add_job(db, "archived", JobStatus.SUCCEEDED.value, completed_days_ago=10, idempotency_key="k1")
+        compact(db, hot_days=7, batch_size=100, now=NOW)
+
+    r = client.get("/v1/jobs/archived")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["status"] == "SUCCEEDED"
+    assert body["result"] == {"digest": "archived"}
+
+    # idempotency keys stay honoured after archival
+    r = client.post("/v1/jobs", json={"type": "hash", "payload": {}, "idempotencyKey": "k1"})
+    assert r.status_code == 200
+    assert r.json()["jobId"] == "archived"
+
+
+def test_purge_archive_drops_expired_rows(client):
+    with app_db.SessionLocal() as db:
+        _add_job(db, "ancient", JobStatus.SUCCEEDED.value, completed_days_ago=100)
+        _add_job(db, "recent", JobStatus.SUCCEEDED.value, completed_days_ago=10)
+        compact(db, hot_days=7, batch_size=100, now=NOW)
+
+        purge_archive(db, archive_days=90, now=NOW)
+
+        assert [j.id for j in db.query(JobArchive)] == ["recent"]
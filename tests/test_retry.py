@@ -1,6 +1,6 @@
 import time
 import pytest
-from app.retry import retry_with_jitter
+from app.retry import retry_with_jitter, is_retryable, PermanentError
 
 
 def test_retry_succeeds_before_cap(monkeypatch):
@@ -125,4 +125,58 @@ def test_jitter_bounds(monkeypatch):
     # attempt=1 → base_delay=0.5, bounds [0.3, 0.7]
     # attempt=2 → base_delay=1.0, bounds [0.6, 1.4]
     assert samples[0] == (0.5 * (1 - 0.4), 0.5 * (1 + 0.4))
-    assert samples[1] == (1.0 * (1 - 0.4), 1.0 * (1 + 0.4))
\ No newline at end of file
+    assert samples[1] == (1.0 * (1 - 0.4), 1.0 * (1 + 0.4))
+
+
+def test_permanent_errors_are_not_retried(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda s: None)
+
+    attempts = {"count": 0}
+
+    def malformed_request():
+        attempts["count"] += 1
+        raise ValueError("missing ip")
+
+    wrapped = retry_with_jitter(
+        max_attempts=5,
+        retryable=is_retryable,
+    )(malformed_request)
+
+    with pytest.raises(ValueError):
+        wrapped()
+    assert attempts["count"] == 1
+    assert is_retryable(ConnectionError("Packet dropped"))
+    assert not is_retryable(PermanentError("bad payload"))
+
+
+def test_budget_stops_retries_and_records_success(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda s: None)
+
+    class FakeBudget:
+        def __init__(self, tokens):
+            self.tokens = tokens
+            self.successes = 0
+
+        def can_retry(self):
+            self.tokens -= 1
+            return self.tokens >= 0
+
+        def record_success(self):
+            self.successes += 1
+
+    attempts = {"count": 0}
+
+    def always_bad_request():
+        attempts["count"] += 1
+        raise ConnectionError("Downstream down")
+
+    budget = FakeBudget(tokens=1)
+    wrapped = retry_with_jitter(max_attempts=5, budget=budget)(always_bad_request)
+
+    with pytest.raises(ConnectionError):
+        wrapped()
+    assert attempts["count"] == 2  # first try + the single budgeted retry
+
+    wrapped_ok = retry_with_jitter(max_attempts=5, budget=budget)(lambda: "ACK")
+    assert wrapped_ok() == "ACK"
+    assert budget.successes == 1
@@ -0,0 +1,99 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+import fakeredis
+from rq import SimpleWorker
+
+import app.worker as worker
+from app.sharding import HashRing, ShardedQueue
+
+
+def _shards(n):
+    return [fakeredis.FakeRedis(server=fakeredis.FakeServer()) for _ in range(n)]
+
+
+def test_ring_spreads_keys_and_is_stable():
+    names = ["redis://a", "redis://b", "redis://c"]
+    ring = HashRing(names)
+    keys = [f"job-{i}" for i in range(3000)]
+    placement = {k: ring.node_for(k) for k in keys}
+
+    counts = Counter(placement.values())
+    assert set(counts) == {0, 1, 2}
+    assert min(counts.values()) > 700
+
+    # adding a node only moves keys onto the new node
+    grown = HashRing(names + ["redis://d"])
+    moved = [k for k in keys if grown.node_for(k) != placement[k]]
+    assert all(grown.node_for(k) == 3 for k in moved)
+    assert len(moved) < len(keys) / 2
+
+
+def test_sharded_queue_routes_and_sums_depths():
+    names = ["redis://a", "redis://b"]
+    q = ShardedQueue("tasksvc", _shards(2), names)
+    for i in range(20):
+        q.enqueue(f"job-{i}", len, "abc")
+
+    depths = q.depths()
+    assert all(d > 0 for d in depths)
+    assert len(q) == 20
+    assert q.queue_for("job-7") is q.queues[HashRing(names).node_for("job-7")]
+
+
+def test_idle_worker_steals_from_deepest_shard(monkeypatch):
+    q = ShardedQueue("tasksvc", _shards(3), ["redis://a", "redis://b", "redis://c"])
+    monkeypatch.setattr(worker, "queue", q)
+    for _ in range(5):
+        q.queues[1].enqueue(len, "abc")
+    for _ in range(2):
+        q.queues[2].enqueue(len, "abc")
+
+    workers = [SimpleWorker([sq], connection=sq.connection) for sq in q.queues]
+
+    assert worker.steal(workers, 0, min_depth=3, batch=4)
+    assert q.depths() == [0, 1, 2]
+    # remaining shards are below the threshold
+    assert not worker.steal(workers, 0, min_depth=3, batch=4)
+
+
+def test_stop_requested_during_steal_ends_the_loop(monkeypatch):
+    q = ShardedQueue("tasksvc", _shards(2), ["redis://a", "redis://b"])
+    monkeypatch.setattr(worker, "queue", q)
+    for _ in range(5):
+        q.queues[1].enqueue(len, "abc")
+
+    workers = [SimpleWorker([sq], connection=sq.connection) for sq in q.queues]
+    home_runs = []
+    monkeypatch.setattr(workers[0], "work", lambda **kw: home_runs.append(kw))
+
+    def _sigterm_mid_steal(**kw):
+        workers[1]._stop_requested = True  # RQ's handler belongs to the victim here
+
+    monkeypatch.setattr(workers[1], "work", _sigterm_mid_steal)
+
+    cfg = dict(worker.load_worker_config(), steal=True, steal_min_depth=1)
+    worker.serve(workers, 0, cfg)
+
+    assert len(home_runs) == 1
+
+
+def test_parked_job_is_promoted_while_shard_is_busy():
+    q = ShardedQueue("tasksvc", _shards(1), ["redis://a"])
+    home = q.queues[0]
+    for _ in range(3):
+        home.enqueue(len, "abc")  # backlog the worker has not drained yet
+    parked = home.enqueue_in(timedelta(seconds=0), len, "parked")
+    assert parked.id not in home.job_ids
+
+    stop = worker.start_promoter(home, interval=0.05)
+    try:
+        deadline = time.time() + 2
+        while parked.id not in home.job_ids and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+
+    assert parked.id in home.job_ids
+    assert len(home) == 4